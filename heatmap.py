@@ -0,0 +1,220 @@
+"""Binned 2D heatmaps of geographic data, sized to the terminal.
+
+Points are binned once (with NumPy) into a fine base grid. Coarser levels
+of a bin pyramid are derived from it by summing 2x2 blocks, so that
+a resize or a zoom only aggregates already-binned counts instead of
+re-scanning the raw table.
+
+Level bins straddling an edge of the requested bins are split between
+them proportionally (i.e. assuming uniform density inside a level bin),
+so that snapping to the level grid does not show up as stripes.
+"""
+
+from functools import cache
+from typing import Literal, Optional
+
+import numpy as np
+
+Resolution = Literal["half-block", "braille"]
+
+# Sub-cell pixels per terminal character (columns, rows)
+SUBCELLS: dict[str, tuple[int, int]] = {
+    "half-block": (1, 2),
+    "braille": (2, 4),
+}
+
+# Minimum number of level bins per requested bin (along each axis)
+OVERSAMPLING = 8
+
+# Dot bits of a braille character, indexed by [row][column]
+BRAILLE_DOTS = ((0x01, 0x08), (0x02, 0x10), (0x04, 0x20), (0x40, 0x80))
+
+
+def bin_counts(
+    width: int, height: int, resolution: Resolution = "half-block"
+) -> tuple[int, int]:
+    """Number of (longitude, latitude) bins filling the terminal area."""
+    sx, sy = SUBCELLS[resolution]
+    return max(width, 1) * sx, max(height, 1) * sy
+
+
+class HeatmapPyramid:
+    """Multi-resolution 2D histogram of latitude/longitude points.
+
+    Level 0 is the base grid of `base_shape` bins (rounded up to powers
+    of two), each further level halves the number of bins along both axes.
+    Arrays are indexed as [longitude, latitude]. Points with a non-finite
+    coordinate or weight (e.g. unknown population) are left out.
+    """
+
+    def __init__(
+        self,
+        lat,
+        lng,
+        weights=None,
+        *,
+        lat_range: tuple[float, float] = (-90, 90),
+        lng_range: tuple[float, float] = (-180, 180),
+        base_shape: tuple[int, int] = (1024, 512),
+    ):
+        _check_range(lat_range)
+        _check_range(lng_range)
+        self.lat_range = lat_range
+        self.lng_range = lng_range
+        lat = np.asarray(lat, dtype=float)
+        lng = np.asarray(lng, dtype=float)
+        valid = np.isfinite(lat) & np.isfinite(lng)
+        if weights is not None:
+            weights = np.asarray(weights, dtype=float)
+            valid &= np.isfinite(weights)
+            weights = weights[valid]
+        # Powers of two can be halved exactly down to the coarsest level
+        base_shape = tuple(
+            1 << (max(n, 1) - 1).bit_length() for n in base_shape
+        )
+        base, _, _ = np.histogram2d(
+            lng[valid],
+            lat[valid],
+            bins=base_shape,
+            range=(lng_range, lat_range),
+            weights=weights,
+        )
+        self.levels: list[np.ndarray] = [base]
+        while min(self.levels[-1].shape) >= 2:
+            self.levels.append(_halve(self.levels[-1]))
+        self._cumulative = [_cumulative(level) for level in self.levels]
+
+    def bins(
+        self,
+        nx: int,
+        ny: int,
+        *,
+        lat_range: Optional[tuple[float, float]] = None,
+        lng_range: Optional[tuple[float, float]] = None,
+    ) -> np.ndarray:
+        """Histogram with `nx` x `ny` bins over the (zoomed) range.
+
+        Uses the coarsest pyramid level with at least `OVERSAMPLING` level
+        bins per requested bin (or the base grid if there is none).
+        Resolution stops at the base grid: zooming in further only spreads
+        each base bin evenly over the requested bins inside it.
+        """
+        lat_range = lat_range or self.lat_range
+        lng_range = lng_range or self.lng_range
+        _check_range(lat_range)
+        _check_range(lng_range)
+        fx = (lng_range[1] - lng_range[0]) / (
+            self.lng_range[1] - self.lng_range[0]
+        )
+        fy = (lat_range[1] - lat_range[0]) / (
+            self.lat_range[1] - self.lat_range[0]
+        )
+        index = 0
+        for i, level in enumerate(self.levels):
+            if (
+                level.shape[0] * fx < OVERSAMPLING * nx
+                or level.shape[1] * fy < OVERSAMPLING * ny
+            ):
+                break
+            index = i
+        level, cumulative = self.levels[index], self._cumulative[index]
+        px = _edge_positions(lng_range, self.lng_range, level.shape[0], nx)
+        py = _edge_positions(lat_range, self.lat_range, level.shape[1], ny)
+        corners = _interpolate(_interpolate(cumulative, px).T, py).T
+        return np.diff(np.diff(corners, axis=0), axis=1)
+
+
+def _check_range(range_: tuple[float, float]) -> None:
+    if not range_[0] < range_[1]:
+        raise ValueError(f"Invalid range {range_}, must be increasing.")
+
+
+def _halve(a: np.ndarray) -> np.ndarray:
+    """Sum 2x2 blocks of an array with even dimensions."""
+    return a[::2, ::2] + a[1::2, ::2] + a[::2, 1::2] + a[1::2, 1::2]
+
+
+def _cumulative(a: np.ndarray) -> np.ndarray:
+    """Sums of a[:i, :j] for all 0 <= i <= nx, 0 <= j <= ny."""
+    result = np.zeros((a.shape[0] + 1, a.shape[1] + 1))
+    result[1:, 1:] = a.cumsum(axis=0).cumsum(axis=1)
+    return result
+
+
+def _edge_positions(window, full, n_level: int, n: int) -> np.ndarray:
+    """Fractional positions in a level's bins of `n + 1` edges of `window`."""
+    edges = np.linspace(window[0], window[1], n + 1)
+    positions = (edges - full[0]) / (full[1] - full[0]) * n_level
+    return np.clip(positions, 0, n_level)
+
+
+def _interpolate(a: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    """Linearly interpolate rows of `a` at fractional row positions."""
+    lower = np.minimum(positions.astype(int), a.shape[0] - 2)
+    fraction = (positions - lower)[:, np.newaxis]
+    return a[lower] * (1 - fraction) + a[lower + 1] * fraction
+
+
+@cache
+def pyramid_from_csv(
+    path: str,
+    lat: str = "latitude",
+    lng: str = "longitude",
+    weight: Optional[str] = None,
+    **kwargs,
+) -> HeatmapPyramid:
+    """Load and bin a table only once per process."""
+    import pandas as pd
+
+    df = pd.read_csv(path, usecols=[c for c in (lat, lng, weight) if c])
+    return HeatmapPyramid(
+        df[lat], df[lng], None if weight is None else df[weight], **kwargs
+    )
+
+
+def _colour(value: float) -> tuple[int, int, int]:
+    # From the white background to the theme's primary blue (#0000c0)
+    rg = int(255 * (1 - value))
+    return rg, rg, 255 - int(63 * value)
+
+
+def _normalize(h: np.ndarray, log: bool) -> np.ndarray:
+    if log:
+        h = np.log1p(h)
+    peak = h.max()
+    return h / peak if peak > 0 else h
+
+
+def render(
+    h: np.ndarray, resolution: Resolution = "half-block", log: bool = True
+) -> str:
+    """ANSI text of a [longitude, latitude] histogram, north up."""
+    # Rows of the image go from north to south
+    image = _normalize(h, log).T[::-1]
+    sx, sy = SUBCELLS[resolution]
+    rows, cols = image.shape[0] // sy, image.shape[1] // sx
+    lines = []
+    for row in range(rows):
+        cells = image[row * sy : (row + 1) * sy]
+        line = []
+        for col in range(cols):
+            cell = cells[:, col * sx : (col + 1) * sx]
+            if resolution == "half-block":
+                top, bottom = _colour(cell[0, 0]), _colour(cell[1, 0])
+                line.append(
+                    "\033[38;2;{};{};{}m\033[48;2;{};{};{}m▀".format(
+                        *top, *bottom
+                    )
+                )
+            else:
+                code = 0x2800
+                for (dy, dx), value in np.ndenumerate(cell):
+                    if value > 0:
+                        code |= BRAILLE_DOTS[dy][dx]
+                line.append(
+                    "\033[38;2;{};{};{}m{}".format(
+                        *_colour(max(cell.max(), 0.1)), chr(code)
+                    )
+                )
+        lines.append("".join(line) + "\033[0m")
+    return "\n".join(lines)
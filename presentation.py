@@ -1,17 +1,30 @@
+import hashlib
+import inspect
 import io
 import os
+import re
+import shutil
 import sys
+import threading
 from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
 from pathlib import Path
 from textwrap import dedent
 from dataclasses import dataclass, field
-from typing import Optional, ClassVar, Literal, Callable
+from typing import Optional, ClassVar, Literal, Callable, Iterator, TextIO
 
 import click
 import rich
+from markdown_it import MarkdownIt
 from rich.text import Text
 from rich.console import Console
 from textual.app import App, ComposeResult
+from textual.command import DiscoveryHit, Hit, Hits, Provider
 from textual.containers import Container, VerticalScroll
 from textual.widget import Widget
 from textual.widgets import Footer, Markdown, Static
@@ -28,7 +41,12 @@ from textual.theme import Theme
     "--continue", "-c", "continue_", is_flag=True, help="Enable debug mode."
 )
 @click.option("--disable-footer", is_flag=True, help="Disable footer.")
-def main(continue_, disable_footer):
+@click.option(
+    "--export",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Write the output of all code slides to a file and exit.",
+)
+def main(continue_, disable_footer, export):
     """Run the presentation deck."""
 
     # *** DEFINITION OF THE SLIDES ***
@@ -62,6 +80,7 @@ def main(continue_, disable_footer):
         # py("slides/colours_rich.py"),
         md("## Example: Simple scatter plot\nMap of Czech cities"),
         py("slides/simple_scatter.py"),
+        py("slides/heatmap.py"),
         md("## Example: Add the path of my train trip to Brno"),
         md("# Aren't we reinventing the wheel?\n\nI actually was/am..."),
         md("slides/libraries.md"),
@@ -81,6 +100,18 @@ def main(continue_, disable_footer):
         md("slides/references.md"),
     ]
 
+    if export:
+        width, height = shutil.get_terminal_size()
+        outputs = render_outputs(slides, width=width - 4, height=height - 2)
+        sections = []
+        for index, slide in enumerate(slides):
+            if not isinstance(slide, CodeSlide):
+                continue
+            output = outputs.get(index, " (skipped: requires alternate screen)")
+            sections.append(f"## {index + 1}. {slide.title_text()}\n\n{output}")
+        Path(export).write_text("\n\n".join(sections), encoding="utf-8")
+        return
+
     app = PresentationApp(slides)
     app.enable_footer = not disable_footer
     if continue_ and Path(".current_slide").exists():
@@ -109,6 +140,121 @@ my_theme = Theme(
 )
 
 
+class CachedMarkdownIt(MarkdownIt):
+    """Markdown parser re-using tokens of recently parsed sources."""
+
+    def __init__(self, *args, max_size: int = 256, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_size = max_size
+        self._tokens: OrderedDict[str, list] = OrderedDict()
+        # Textual parses in a worker thread
+        self._lock = threading.Lock()
+
+    def parse(self, src: str, env=None):
+        if env is not None:
+            return super().parse(src, env)
+        key = hashlib.sha1(src.encode("utf-8")).hexdigest()
+        with self._lock:
+            if key in self._tokens:
+                self._tokens.move_to_end(key)
+                return self._tokens[key]
+        tokens = super().parse(src)
+        with self._lock:
+            self._tokens[key] = tokens
+            while len(self._tokens) > self.max_size:
+                self._tokens.popitem(last=False)
+        return tokens
+
+
+markdown_parser = CachedMarkdownIt("gfm-like")
+
+
+def cached_markdown(source: str) -> Markdown:
+    """Markdown widget parsed only once per distinct source."""
+    return Markdown(source, parser_factory=lambda: markdown_parser)
+
+
+class SlideIndex:
+    """Inverted index over titles, text and code of all slides."""
+
+    def __init__(self, slides: list["Slide"]):
+        self.titles: list[str] = []
+        self._terms: list[set[str]] = []
+        self._postings: dict[str, set[int]] = {}
+        self._sorted_terms: Optional[list[str]] = None
+        for index, slide in enumerate(slides):
+            self.titles.append("")
+            self._terms.append(set())
+            self.update(index, slide)
+
+    def update(self, index: int, slide: "Slide") -> None:
+        """(Re-)index a single slide, e.g. after reload."""
+        for term in self._terms[index]:
+            self._postings[term].discard(index)
+            if not self._postings[term]:
+                del self._postings[term]
+        terms = set(_tokenize(slide.title_text() + "\n" + slide.search_text()))
+        for term in terms:
+            self._postings.setdefault(term, set()).add(index)
+        self._terms[index] = terms
+        self.titles[index] = slide.title_text()
+        self._sorted_terms = None
+
+    def search(self, query: str) -> list[int]:
+        """Slides containing all words of the query (as word prefixes)."""
+        words = _tokenize(query)
+        if not words:
+            return []
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self._postings)
+        found: Optional[set[int]] = None
+        for word in words:
+            matches = set()
+            terms = self._sorted_terms
+            i = bisect_left(terms, word)
+            while i < len(terms) and terms[i].startswith(word):
+                matches |= self._postings[terms[i]]
+                i += 1
+            found = matches if found is None else found & matches
+            if not found:
+                return []
+        return sorted(found)
+
+
+def _tokenize(text: str) -> list[str]:
+    return re.findall(r"\w+", text.lower())
+
+
+class SlideCommands(Provider):
+    """Command palette entries to jump to a slide."""
+
+    def _jump(self, index: int) -> tuple[str, Callable[[], None]]:
+        app = self.app
+        title = f"{index + 1}. {app.search_index.titles[index]}"
+        return title, partial(app.switch_to_slide, index)
+
+    async def discover(self) -> Hits:
+        for index in range(len(self.app.slides)):
+            title, command = self._jump(index)
+            yield DiscoveryHit(title, command, help="Go to slide")
+
+    async def search(self, query: str) -> Hits:
+        matcher = self.matcher(query)
+        index = self.app.search_index
+        candidates = index.search(query)
+        # No word matches, fall back to fuzzy matching the titles
+        fuzzy_only = not candidates
+        if fuzzy_only:
+            candidates = range(len(index.titles))
+        for slide_index in candidates:
+            title, command = self._jump(slide_index)
+            score = matcher.match(title)
+            if score > 0:
+                yield Hit(score, matcher.highlight(title), command)
+            elif not fuzzy_only:
+                yield Hit(0.01, title, command, help="Found in slide")
+
+
 class PresentationApp(App):
     """A Textual app for the presentation."""
 
@@ -124,11 +270,14 @@ class PresentationApp(App):
         ("home", "home", "First slide"),
         ("e", "edit", "Edit"),
         ("r", "reload", "Reload"),
+        ("g", "command_palette", "Go to"),
         # ("d", "toggle_dark", "Toggle dark mode")
     ]
 
     TITLE = "▃█▅ Terminal plotting"
 
+    COMMANDS = App.COMMANDS | {SlideCommands}
+
     CSS = """
         Screen {
             align: center middle;
@@ -139,6 +288,7 @@ class PresentationApp(App):
 
     def __init__(self, slides, **kwargs):
         self.slides = slides
+        self.search_index = SlideIndex(slides)
         super().__init__(**kwargs)
 
     def compose(self) -> ComposeResult:
@@ -168,6 +318,7 @@ class PresentationApp(App):
 
     def action_reload(self) -> None:
         self.current_slide.reload()
+        self.search_index.update(self.slide_index, self.current_slide)
         self.update_slide()
 
     def action_next_slide(self) -> None:
@@ -192,6 +343,7 @@ class PresentationApp(App):
 
                 os.system(f"$EDITOR {self.current_slide.path}")
             self.current_slide.reload()
+            self.search_index.update(self.slide_index, self.current_slide)
         self.update_slide()
 
     @property
@@ -232,6 +384,14 @@ class Slide(ABC):
     @abstractmethod
     def render(self, app: App) -> Widget: ...
 
+    def title_text(self) -> str:
+        """Plain-text title of the slide (e.g. for jumping to it)."""
+        return _first_line(self.source) or str(self.path or "")
+
+    def search_text(self) -> str:
+        """All text of the slide to search in."""
+        return self.source
+
     def is_runnable(self) -> bool:
         return False
 
@@ -251,6 +411,16 @@ class CodeSlide(Slide):
     title: Optional[str] = None
     is_title_markdown: bool = False
 
+    def title_text(self) -> str:
+        return (
+            _first_line(self.title or "")
+            or str(self.path or "")
+            or _first_line(self.source)
+        )
+
+    def search_text(self) -> str:
+        return f"{self.title or ''}\n{self.source}"
+
     def render(self, app) -> Widget:
         match self.mode:
             case "code":
@@ -269,51 +439,55 @@ class CodeSlide(Slide):
         )
         if self.title:
             if self.is_title_markdown:
-                return Markdown(self.title + f"\n\n```{self.language}\n{code}\n```")
-            return Markdown(
+                return cached_markdown(
+                    self.title + f"\n\n```{self.language}\n{code}\n```"
+                )
+            return cached_markdown(
                 f"## {self.title}\n\n```{self.language}\n{code}\n```"
             )
-        return Markdown(f"```{self.language}\n{code}\n```")
+        return cached_markdown(f"```{self.language}\n{code}\n```")
 
-    def _render_output(self, app) -> Widget:
-        import io
-        from contextlib import redirect_stdout
+    def render_output_text(self, width: int, height: int) -> str:
+        """Run the code and capture its output.
 
-        f = io.StringIO()
+        Safe to call from several threads at once (see `isolated_execution`).
+        """
         try:
             match self.language:
                 case "python":
-                    with redirect_stdout(f):
+                    with isolated_execution() as f:
                         import plotext as plt
 
                         plt.plotsize(width=50, height=15)
-                        self._exec(app=app)
+                        self._exec(width=width, height=height)
                     output = f.getvalue()
                 case "shell":
                     import subprocess
                     output = subprocess.check_output(self.source, shell=True).decode("utf-8")
         except Exception as ex:
-            output = f"Error: {ex}"
-        else:
-            output = "\n".join(
-                " " + line.rstrip() for line in output.splitlines()
-            )
+            return f"Error: {ex}"
+        return "\n".join(" " + line.rstrip() for line in output.splitlines())
+
+    def _render_output(self, app) -> Widget:
+        output = self.render_output_text(*_code_size(app))
         output_widget = Static(Text.from_ansi(output))
         if self.title:
             if self.is_title_markdown:
-                return Container(Markdown(self.title), output_widget)
-            return Container(Markdown(f"## {self.title}"), output_widget)
+                return Container(cached_markdown(self.title), output_widget)
+            return Container(
+                cached_markdown(f"## {self.title}"), output_widget
+            )
         return output_widget
 
-    def _exec(self, app: App) -> None:
+    def _exec(self, width: int, height: int) -> None:
         match self.language:
             case "python":
                 exec(
                     self.source,
                     globals=globals()
                     | {
-                        "WIDTH": app.size.width - 4,
-                        "HEIGHT": app.size.height - 2,
+                        "WIDTH": width,
+                        "HEIGHT": height,
                     },
                 )
                 import plotext as plt
@@ -331,7 +505,7 @@ class CodeSlide(Slide):
         with app.suspend():
             console = Console()
             console.clear()
-            self._exec(app)
+            self._exec(*_code_size(app))
             if self.wait_for_key:
                 self._wait_for_key()
             self.mode = "code"
@@ -357,10 +531,104 @@ class CodeSlide(Slide):
 
 
 
+def _code_size(app: App) -> tuple[int, int]:
+    """WIDTH and HEIGHT available to code slides."""
+    return app.size.width - 4, app.size.height - 2
+
+
+_stdout_sink: ContextVar[Optional[TextIO]] = ContextVar(
+    "stdout_sink", default=None
+)
+_plotext_figure: ContextVar[Any] = ContextVar("plotext_figure")
+_install_lock = threading.Lock()
+
+
+class ContextStdout:
+    """sys.stdout replacement writing to the sink of the current context.
+
+    Outside of `isolated_execution`, everything goes to the wrapped stream.
+    """
+
+    def __init__(self, stream: TextIO):
+        self._stream = stream
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(_stdout_sink.get() or self._stream, name)
+
+
+class _ContextFigure:
+    """Stand-in for plotext's global figure, delegating per context."""
+
+    def __init__(self, figure: Any):
+        object.__setattr__(self, "_figure", figure)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(_plotext_figure.get(self._figure), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(_plotext_figure.get(self._figure), name, value)
+
+
+def _install_context_globals() -> None:
+    """Replace process-wide stdout and plotext figure by per-context ones."""
+    with _install_lock:
+        # Textual swaps sys.stdout when running / suspending the app
+        if not isinstance(sys.stdout, ContextStdout):
+            sys.stdout = ContextStdout(sys.stdout)
+        import plotext._core
+        import plotext._global
+
+        if not isinstance(plotext._global.figure, _ContextFigure):
+            figure = _ContextFigure(plotext._global.figure)
+            plotext._global.figure = plotext._core._figure = figure
+
+
+@contextmanager
+def isolated_execution() -> Iterator[io.StringIO]:
+    """Capture stdout and use a fresh plotext figure in the current context.
+
+    Unlike `redirect_stdout`, this does not affect other threads, so that
+    several code slides can be executed concurrently. (plotille keeps its
+    state in `Figure` instances local to each slide.)
+    """
+    from plotext._figure import _figure_class
+
+    _install_context_globals()
+    sink = io.StringIO()
+    sink_token = _stdout_sink.set(sink)
+    figure_token = _plotext_figure.set(_figure_class())
+    try:
+        yield sink
+    finally:
+        _plotext_figure.reset(figure_token)
+        _stdout_sink.reset(sink_token)
+
+
+def render_outputs(
+    slides: list[Slide], width: int, height: int, max_workers: int = 8
+) -> dict[int, str]:
+    """Render outputs of all non-interactive code slides in parallel.
+
+    Returns:
+        Outputs keyed by the index of the slide.
+    """
+    code_slides = {
+        index: slide
+        for index, slide in enumerate(slides)
+        if isinstance(slide, CodeSlide) and not slide.requires_alt_screen
+    }
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        outputs = executor.map(
+            lambda slide: slide.render_output_text(width, height),
+            code_slides.values(),
+        )
+        return dict(zip(code_slides, outputs))
+
+
 class MarkdownSlide(Slide):
     """Markdown slide with source from external file or string."""
     def render(self, app: App) -> Markdown:
-        return Markdown(dedent(self.source))
+        return cached_markdown(dedent(self.source))
 
 
 @dataclass
@@ -370,16 +638,42 @@ class FuncSlide(Slide):
     source = ""  # ignored
     path = None  # ignored
 
+    def title_text(self) -> str:
+        # Python comments start with a single "#", so look for "##" headings
+        if match := re.search(r"^\s*#{2,6}\s+(.+)$", self._f_source(), re.M):
+            return match.group(1).strip()
+        return _first_line(self.f.__doc__ or "") or self.f.__name__.replace(
+            "_", " "
+        )
+
+    def search_text(self) -> str:
+        return self._f_source()
+
+    def _f_source(self) -> str:
+        """Source code of the function (containing the slide template)."""
+        try:
+            return inspect.getsource(self.f)
+        except (OSError, TypeError):
+            return f"{self.f.__name__}\n{self.f.__doc__ or ''}"
+
     def render(self, app: App):
         rendered = self.f(app)
         if isinstance(rendered, Widget):
             return rendered
         elif isinstance(rendered, str):
-            return Markdown(dedent(rendered))
+            return cached_markdown(dedent(rendered))
         elif isinstance(rendered, (Text, Panel)):
             return Static(rendered)
 
 
+def _first_line(text: str) -> str:
+    """First non-empty line of text without Markdown heading marks."""
+    for line in text.splitlines():
+        if line := line.strip().lstrip("#").strip():
+            return line
+    return ""
+
+
 def dyn_md(f: Callable[[App], Any]):
     return FuncSlide(f=f)
 
@@ -426,7 +720,7 @@ def colours(app: App):
 
 def md(path_or_text: str, **kwargs):
     """Helper function to create a Markdown slide."""
-    if Path(path_or_text).exists():
+    if path_or_text.endswith(".md") and Path(path_or_text).exists():
         kwargs["path"] = path_or_text
     else:
         kwargs["source"] = path_or_text
@@ -439,7 +733,7 @@ def py(path_or_text: str, **kwargs):
         "language": "python",
         **kwargs,
     }
-    if Path(path_or_text).exists():
+    if path_or_text.endswith(".py") and Path(path_or_text).exists():
         kwargs["path"] = path_or_text
         if "title" not in kwargs:
             kwargs["title"] = path_or_text
@@ -0,0 +1,12 @@
+from heatmap import bin_counts, pyramid_from_csv, render
+
+# Binned only once, later resizes re-use the cached pyramid
+pyramid = pyramid_from_csv(
+    "cities.csv",
+    weight="population",
+    lat_range=(48.5, 51.1),
+    lng_range=(12.0, 18.9),
+    base_shape=(512, 256),
+)
+nx, ny = bin_counts(WIDTH // 2, HEIGHT - 4, "half-block")
+print(render(pyramid.bins(nx, ny), "half-block"))
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from heatmap import HeatmapPyramid, render
+
+
+@pytest.fixture(scope="module")
+def uniform():
+    rng = np.random.default_rng(42)
+    n = 2_000_000
+    return rng.uniform(-90, 90, n), rng.uniform(-180, 180, n)
+
+
+@pytest.mark.parametrize("nx, ny", [(80, 40), (200, 100), (7, 3)])
+def test_uniform_input_gives_uniform_output(uniform, nx, ny):
+    lat, lng = uniform
+    h = HeatmapPyramid(lat, lng).bins(nx, ny)
+    assert h.shape == (nx, ny)
+    assert h.sum() == pytest.approx(len(lat))
+    for totals in (h.sum(axis=1), h.sum(axis=0)):
+        assert totals.max() / totals.min() < 1.1
+
+
+@pytest.mark.parametrize("base_shape", [(1000, 500), (300, 150)])
+def test_non_power_of_two_base_shape(uniform, base_shape):
+    lat, lng = uniform
+    pyramid = HeatmapPyramid(lat, lng, base_shape=base_shape)
+    assert pyramid.bins(33, 17).sum() == pytest.approx(len(lat))
+    zoomed = pyramid.bins(40, 20, lat_range=(0, 45), lng_range=(0, 90))
+    inside = (lat >= 0) & (lat < 45) & (lng >= 0) & (lng < 90)
+    assert zoomed.sum() == pytest.approx(inside.sum(), rel=1e-3)
+
+
+def test_non_finite_values_are_skipped():
+    lat = np.array([50.0, 49.2, np.nan, 49.8])
+    lng = np.array([14.4, 16.6, 18.3, np.inf])
+    population = np.array([1_357_000, np.nan, 289_000, 100_000])
+    pyramid = HeatmapPyramid(
+        lat, lng, population, lat_range=(48.5, 51.1), lng_range=(12, 19)
+    )
+    h = pyramid.bins(80, 40)
+    assert np.isfinite(h).all()
+    assert h.sum() == pytest.approx(1_357_000)
+    for resolution in ("half-block", "braille"):
+        assert render(h, resolution)
+
+
+@pytest.mark.parametrize(
+    "ranges", [{"lat_range": (45, 0)}, {"lng_range": (10, 10)}]
+)
+def test_invalid_range(uniform, ranges):
+    lat, lng = uniform
+    pyramid = HeatmapPyramid(lat[:1000], lng[:1000])
+    with pytest.raises(ValueError):
+        pyramid.bins(10, 10, **ranges)
+    with pytest.raises(ValueError):
+        HeatmapPyramid(lat[:1000], lng[:1000], **ranges)
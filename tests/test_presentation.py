@@ -0,0 +1,51 @@
+import sys
+
+import pytest
+
+if sys.version_info < (3, 13):
+    pytest.skip("code slides need Python 3.13+", allow_module_level=True)
+
+pytest.importorskip("plotext")
+pytest.importorskip("textual")
+
+from presentation import py, render_outputs  # noqa: E402
+
+# Sleeps let the threads interleave between the steps
+SOURCE = """\
+import time
+import plotext as plt
+
+print("start of slide {n}")
+time.sleep(0.01)
+plt.plot([{n}, {n} + 1, 2 * {n} + 2])
+time.sleep(0.01)
+plt.title("Plot {n}")
+time.sleep(0.01)
+plt.show()
+print("end of slide {n}")
+"""
+
+
+@pytest.fixture
+def slides():
+    return [py(SOURCE.format(n=n)) for n in range(16)]
+
+
+def test_parallel_rendering_matches_serial(slides):
+    serial = {
+        index: slide.render_output_text(80, 30)
+        for index, slide in enumerate(slides)
+    }
+    for _ in range(5):
+        assert render_outputs(slides, 80, 30, max_workers=16) == serial
+
+
+def test_outputs_do_not_mix(slides):
+    outputs = render_outputs(slides, 80, 30, max_workers=16)
+    for n, output in outputs.items():
+        assert output.count("start of slide") == 1
+        assert output.count("end of slide") == 1
+        assert f"start of slide {n}\n" in output
+        assert f"end of slide {n}" in output
+        assert output.count("Plot ") == 1
+        assert f"Plot {n}" in output